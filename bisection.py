@@ -17,22 +17,36 @@ Universal lossless compression via multilevel pattern matching,
 IEEE Trans. on Info. Theory, 46(5), 1227--1245, 2000.
 """
 
+import collections
 import unittest
 
 """
 The algorithm, the myth, the legend.
 """
 def getBisectionGrammar(S):
-
-	def _recurse(S, grammar):
-		if len(S) <= 1:
-			return
-		grammar[S] = [S[:len(S)/2], S[len(S)/2:]]
-		_recurse(S[:len(S)/2], grammar)
-		_recurse(S[len(S)/2:], grammar)
+	# Work on a byte string, one byte per symbol, if S is ASCII.
+	if str is bytes and isinstance(S, unicode):
+		try:
+			S = S.encode('ascii')
+		except UnicodeEncodeError:
+			pass
 
 	grammar = {}
-	_recurse(S, grammar)
+	# Walk the bisection tree breadth-first with a worklist of
+	# (offset, length) intervals of S, so each substring is sliced
+	# exactly once. A substring already in the grammar has an
+	# identical subtree, so it is not expanded again.
+	todo = collections.deque([(0, len(S), S)])
+	while todo:
+		offset, length, s = todo.popleft()
+		if length <= 1 or s in grammar:
+			continue
+		half = length // 2
+		left = S[offset:offset+half]
+		right = S[offset+half:offset+length]
+		grammar[s] = [left, right]
+		todo.append((offset, half, left))
+		todo.append((offset+half, length-half, right))
 
 	return grammar
 
@@ -41,19 +55,36 @@ class Test__getBisectionGrammar(unittest.TestCase):
 
 	def test1(self):
 		grammar = getBisectionGrammar('abcdefgh')
-		self.assertEquals(grammar['abcdefgh'], ['abcd', 'efgh'])
-		self.assertEquals(grammar['abcd'], ['ab', 'cd'])
-		self.assertEquals(grammar['efgh'], ['ef', 'gh'])
-		self.assertEquals(grammar['ab'], ['a', 'b'])
-		self.assertEquals(grammar['cd'], ['c', 'd'])
-		self.assertEquals(grammar['ef'], ['e', 'f'])
-		self.assertEquals(grammar['gh'], ['g', 'h'])
+		self.assertEqual(grammar['abcdefgh'], ['abcd', 'efgh'])
+		self.assertEqual(grammar['abcd'], ['ab', 'cd'])
+		self.assertEqual(grammar['efgh'], ['ef', 'gh'])
+		self.assertEqual(grammar['ab'], ['a', 'b'])
+		self.assertEqual(grammar['cd'], ['c', 'd'])
+		self.assertEqual(grammar['ef'], ['e', 'f'])
+		self.assertEqual(grammar['gh'], ['g', 'h'])
 
 	def test2(self):
 		grammar = getBisectionGrammar('abababab')
-		self.assertEquals(grammar['abababab'], ['abab', 'abab'])	
-		self.assertEquals(grammar['abab'], ['ab', 'ab'])
-		self.assertEquals(grammar['ab'], ['a', 'b'])
+		self.assertEqual(grammar['abababab'], ['abab', 'abab'])	
+		self.assertEqual(grammar['abab'], ['ab', 'ab'])
+		self.assertEqual(grammar['ab'], ['a', 'b'])
+
+	def test3(self):
+		grammar = getBisectionGrammar('abcab')
+		self.assertEqual(len(grammar), 3)
+		self.assertEqual(grammar['abcab'], ['ab', 'cab'])
+		self.assertEqual(grammar['cab'], ['c', 'ab'])
+		self.assertEqual(grammar['ab'], ['a', 'b'])
+
+	def test4(self):
+		grammar = getBisectionGrammar(u'abab')
+		self.assertEqual(grammar[u'abab'], ['ab', 'ab'])
+		self.assertTrue(all(type(k) is str for k in grammar))
+
+	def test5(self):
+		grammar = getBisectionGrammar(u'h\xe9llo')
+		self.assertEqual(grammar[u'h\xe9llo'], [u'h\xe9', u'llo'])
+		self.assertEqual(grammar[u'h\xe9'], [u'h', u'\xe9'])
 
 if __name__ == '__main__':
 	unittest.main()
@@ -4,76 +4,211 @@ algorithm for the smallest S2F grammar problem.
 """
 import unittest
 
+"""
+Description:
+Generates every binary tree with n leaves, i.e. every way of
+recursively splitting a string of length n in two.
+
+Discussion:
+Trees only depend on n, so the trees of each smaller size are built
+once from the sizes below them and shared, and only the trees for n
+itself are produced lazily.
+
+Input:
+A positive integer n.
+
+Output:
+A generator of trees. A tree is None if it is a single leaf, and
+otherwise a tuple (i, left, right) where i is the number of leaves in
+the left subtree and left and right are the subtrees.
+"""
+def generateAllTrees(n):
+	if n == 1:
+		yield None
+		return
+	trees = [None, [None]] # trees[k] lists the trees with k leaves
+	for k in range(2, n):
+		trees.append([(i, left, right) for i in range(1, k)
+			for left in trees[i] for right in trees[k-i]])
+	for i in range(1, n):
+		for left in trees[i]:
+			for right in trees[n-i]:
+				yield (i, left, right)
+
+"""
+Description:
+Converts a tree from generateAllTrees into the grammar it induces
+on a string. If a substring occurs more than once in the tree with
+different splits, the split closest to the start of a preorder walk
+is kept.
+
+Input:
+A string and a tree with as many leaves as the string has symbols.
+
+Output:
+A grammar (dictionary) mapping each non-terminal to its two halves.
+"""
+def treeToGrammar(S, tree):
+	G = {}
+	stack = [(S, tree)]
+	while stack:
+		s, t = stack.pop()
+		if t is None:
+			continue
+		i, left, right = t
+		if s not in G:
+			G[s] = [s[:i], s[i:]]
+		stack.append((s[i:], right))
+		stack.append((s[:i], left))
+	return G
+
 def generateAllGrammars(goal):
-	if(len(goal) == 1):
-		yield {}
-		raise StopIteration
-	else:
-		for i in xrange(1, len(goal)):
-			left = goal[:i]
-			right = goal[i:]
-			for g in generateAllGrammars(left):
-				for h in generateAllGrammars(right):
-					G = {goal: [left, right]}
-					G.update(h) 
-					G.update(g) # left side gets precedence
-					yield G
-		raise StopIteration
+	for tree in generateAllTrees(len(goal)):
+		yield treeToGrammar(goal, tree)
 
 """
 Description:
 Creates a grammar for the string which is
 the smallest (srsly!). 
+
+Discussion:
+Rather than enumerating every binary parse tree of the string (as
+generateAllGrammars does), each distinct substring needing a rule
+is given one split, depth-first, and a partial grammar is abandoned
+as soon as it has more rules than the best complete grammar found so
+far. This is still exact: a grammar whose smallest version gives two
+occurrences of a substring different splits can always be made no
+larger by using the same split for both. Among the smallest grammars,
+one with the fewest stages is returned.
 """
 def getExhaustiveGrammar(S):
 
+	# post-order walk with an explicit stack, counting each
+	# non-terminal once; terminals are at stage 0
 	def stageCount(G, s):
-		if s not in G:
-			return 0
-		else:
-			return max([stageCount(G, t) for t in G[s]]) + 1 
+		stages = {}
+		stack = [s]
+		while stack:
+			t = stack[-1]
+			if t in stages or t not in G:
+				stack.pop()
+				continue
+			children = [u for u in G[t] if u in G and u not in stages]
+			if children:
+				stack.extend(children)
+			else:
+				stages[t] = max([stages.get(u, 0) for u in G[t]]) + 1
+				stack.pop()
+		return stages.get(s, 0)
 
+	# G maps each substring given a rule so far to its rule, or to
+	# None while it is still waiting in pending for a split
+	def search(G, pending):
+		if not pending:
+			score = (len(G), stageCount(G, S))
+			if best[0] is None or score < best[0]:
+				best[0] = score
+				best[1] = dict(G)
+			return
+		s = pending.pop()
+		for i in range(1, len(s)):
+			left = s[:i]
+			right = s[i:]
+			new = []
+			if len(left) > 1 and left not in G:
+				new.append(left)
+			if len(right) > 1 and right not in G and right != left:
+				new.append(right)
+			if best[0] is not None and len(G) + len(new) > best[0][0]:
+				continue
+			G[s] = [left, right]
+			for t in new:
+				G[t] = None
+			search(G, pending + new)
+			for t in new:
+				del G[t]
+		G[s] = None
+		pending.append(s)
 
-	return min([g for g in generateAllGrammars(S)], key=lambda G: (len(G), stageCount(G, S)))
+	if len(S) <= 1:
+		return {}
+	best = [None, None] # (size, stage count) and grammar
+	search({S: None}, [S])
+	return best[1]
 		
 class Test__generateAllGrammars(unittest.TestCase):	
 
 	def test1(self):
 		grammars = [g for g in generateAllGrammars('ababc')]
-		self.assertEquals(len(grammars), 14) # 5th catalan number
+		self.assertEqual(len(grammars), 14) # 5th catalan number
 		G = grammars[0]
-		self.assertEquals(G['ababc'], ['a', 'babc'])
-		self.assertEquals(G['babc'], ['b', 'abc'])
-		self.assertEquals(G['abc'], ['a', 'bc'])
-		self.assertEquals(G['bc'], ['b', 'c'])
+		self.assertEqual(G['ababc'], ['a', 'babc'])
+		self.assertEqual(G['babc'], ['b', 'abc'])
+		self.assertEqual(G['abc'], ['a', 'bc'])
+		self.assertEqual(G['bc'], ['b', 'c'])
 		G = grammars[13]
-		self.assertEquals(G['ababc'], ['abab', 'c'])
-		self.assertEquals(G['abab'], ['aba', 'b'])
-		self.assertEquals(G['aba'], ['ab', 'a'])
-		self.assertEquals(G['ab'], ['a', 'b'])
+		self.assertEqual(G['ababc'], ['abab', 'c'])
+		self.assertEqual(G['abab'], ['aba', 'b'])
+		self.assertEqual(G['aba'], ['ab', 'a'])
+		self.assertEqual(G['ab'], ['a', 'b'])
 		
 
+class Test__generateAllTrees(unittest.TestCase):
+
+	def test1(self):
+		self.assertEqual(list(generateAllTrees(1)), [None])
+		self.assertEqual(list(generateAllTrees(2)), [(1, None, None)])
+		self.assertEqual(list(generateAllTrees(3)),
+			[(1, None, (1, None, None)), (2, (1, None, None), None)])
+		self.assertEqual(len(list(generateAllTrees(6))), 42)
+
+class Test__treeToGrammar(unittest.TestCase):
+
+	def test1(self):
+		self.assertEqual(treeToGrammar('a', None), {})
+		G = treeToGrammar('abab', (2, (1, None, None), (1, None, None)))
+		self.assertEqual(G, {'abab': ['ab', 'ab'], 'ab': ['a', 'b']})
+
+	def test2(self):
+		# 'aaa' is split as 'a'+'aa' on the left and 'aa'+'a' on the right
+		right = (2, (1, None, None), None)
+		left = (1, None, (1, None, None))
+		G = treeToGrammar('aaaaaa', (3, left, right))
+		self.assertEqual(G['aaa'], ['a', 'aa'])
+
 class Test__getExhaustiveGrammar(unittest.TestCase):
 
 	def test1(self):
 		G = getExhaustiveGrammar('abab')
-		self.assertEquals(G['abab'], ['ab', 'ab'])
-		self.assertEquals(G['ab'], ['a', 'b'])
+		self.assertEqual(G['abab'], ['ab', 'ab'])
+		self.assertEqual(G['ab'], ['a', 'b'])
 
 	def test2(self):
 		G = getExhaustiveGrammar('abababab')
-		self.assertEquals(G['abababab'], ['abab', 'abab'])
-		self.assertEquals(G['abab'], ['ab', 'ab'])
-		self.assertEquals(G['ab'], ['a', 'b'])
+		self.assertEqual(G['abababab'], ['abab', 'abab'])
+		self.assertEqual(G['abab'], ['ab', 'ab'])
+		self.assertEqual(G['ab'], ['a', 'b'])
 
 	def test3(self):
 		G = getExhaustiveGrammar('abcabcabc')
 		self.assertTrue(G['abcabcabc'] == ['abc', 'abcabc'] or G['abcabcabc'] == ['abcabc', 'abc'])
-		self.assertEquals(G['abcabc'], ['abc', 'abc'])
+		self.assertEqual(G['abcabc'], ['abc', 'abc'])
 		self.assertTrue(G['abc'] == ['a', 'bc'] or G['abc'] == ['ab', 'c'])
 		self.assertTrue(('ab' in G and G['ab'] == ['a', 'b']) or
 			('bc' in G and G['bc'] == ['b', 'c']))
 
+	def test4(self):
+		G = getExhaustiveGrammar('abababababababab')
+		self.assertEqual(len(G), 4)
+		self.assertEqual(G['abababababababab'], ['abababab', 'abababab'])
+		self.assertEqual(G['abababab'], ['abab', 'abab'])
+		self.assertEqual(G['abab'], ['ab', 'ab'])
+		self.assertEqual(G['ab'], ['a', 'b'])
+
+	def test5(self):
+		self.assertEqual(getExhaustiveGrammar('a'), {})
+		self.assertEqual(len(getExhaustiveGrammar('abcdabcdabcdabce')), 7)
+
 if __name__ == '__main__':
 	unittest.main()
 		
@@ -16,10 +16,37 @@ Journal of the ACM, 41(4): 630--647, 1994.
 
 import math
 import unittest
-import copy
+import bisect
+import heapq
 import random
 import string
 
+"""
+Description:
+Computes the Knuth-Morris-Pratt failure function of a string, i.e.
+for each prefix of the string, the length of its longest proper
+prefix that is also a suffix.
+
+Input:
+A string s.
+
+Output:
+A list whose ith entry is the length of the longest proper
+prefix of s[:i+1] that is also a suffix of s[:i+1].
+"""
+def computeFailureFunction(s):
+	failure = [0] * len(s)
+	k = 0
+	for i in xrange(1, len(s)):
+		c = s[i]
+		while k > 0 and c != s[k]:
+			k = failure[k-1]
+		if c == s[k]:
+			k += 1
+		failure[i] = k
+	return failure
+
+
 """
 Description:
 Computes the amount of overlap between two strings, i.e.
@@ -31,9 +58,15 @@ Overlap here is defined as it is on page 3 of [2], namely
 ``...let v be the longest string such that s = uv, t = vw
 for some non-empty strings u and w. We call |v| the amount of
 overlap between s and t''.
+Given the failure function of s2, the overlap is found in a single
+pass over s1 by matching it against s2 with the Knuth-Morris-Pratt
+automaton. Otherwise, building the failure function for one query
+costs more than trying the candidate starts in s1 with str.find and
+str.startswith, which run in C, so that is done instead.
 
 Input:
-A pair of strings s1 and s2.
+A pair of strings s1 and s2, and optionally the failure
+function of s2 (to avoid recomputing it).
 
 Output:
 A tuple containing the length of the longest overlap between
@@ -41,15 +74,46 @@ these two strings, and the indices in s1 and s2 where the
 overlap starts. By definition one of the indices must be 0.
 Returns (0, length of s1, 0) if no overlap exists. 
 """
-def computeOverlap(s1, s2):
-        max_overlap = (0, len(s1), 0)
-	# slide s1 to the right over s2
-	# do not slide all the way: prefix and suffix
-	# must each be non-empty
-        for i in xrange(1, min(len(s1), len(s2))): 
-                if (s1[-i:] == s2[:i]):
-                       max_overlap = max(max_overlap, (i, len(s1)-i, 0))   
-        return max_overlap 
+def computeOverlap(s1, s2, failure=None):
+	n2 = len(s2)
+	if len(s1) < 2 or n2 < 2:
+		return (0, len(s1), 0)
+	if failure is None:
+		# candidate starts, earliest (longest overlap) first
+		n1 = len(s1)
+		first = s2[0]
+		i = s1.find(first, max(1, n1 - n2 + 1))
+		while i != -1:
+			if s2.startswith(s1[i:]):
+				return (n1-i, i, 0)
+			i = s1.find(first, i + 1)
+		return (0, n1, 0)
+	# Match s2 against s1 starting at index 1 so the matched suffix
+	# of s1 is never all of s1. The state only depends on the last n2
+	# symbols read, so any earlier ones are skipped, and while nothing
+	# is matched str.find jumps to the next occurrence of s2[0].
+	n1 = len(s1)
+	first = s2[0]
+	k = 0
+	i = max(1, n1 - n2)
+	while i < n1:
+		if k == 0:
+			i = s1.find(first, i)
+			if i == -1:
+				break
+			k = 1
+			i += 1
+			continue
+		c = s1[i]
+		while k > 0 and (k == n2 or c != s2[k]):
+			k = failure[k-1]
+		if c == s2[k]:
+			k += 1
+		i += 1
+	# the matched prefix of s2 must not be all of s2
+	if k == n2:
+		k = failure[k-1]
+	return (k, len(s1)-k, 0)
 
 
 """
@@ -72,6 +136,29 @@ def pairWithMaximumOverlap(Ss):
         return (Ss[max_overlap[1]], Ss[max_overlap[2]])  
 
 
+"""
+Description:
+Finds the first index at or after i that has not been deleted from a
+sequence where deletions are never undone. Each live index points to
+itself and each deleted index points further right, so following the
+pointers (halving the path as it goes, as in union-find) skips runs of
+deleted indices in amortized near-constant time.
+
+Input:
+A list of pointers, whose last entry is a sentinel pointing to itself,
+and an index into it.
+
+Output:
+The smallest live index that is at least i, or the sentinel index
+if there is none.
+"""
+def findNextAlive(nextAlive, i):
+	while nextAlive[i] != i:
+		nextAlive[i] = nextAlive[nextAlive[i]]
+		i = nextAlive[i]
+	return i
+
+
 """
 Description:
 First, produces a single string containing an input set of strings.
@@ -91,23 +178,69 @@ at which an input string started.
 """
 def blumSmallestSuperstringAndBreaking(Ss):
 	# compute the small superstring
-        strings = copy.deepcopy(Ss)
-	substringSubstringIndices = {}
-	for i in xrange(0, len(strings)):
-		substringSubstringIndices[strings[i]] = [0]
-        while (len(strings) > 1):
-                s1, s2 = pairWithMaximumOverlap(strings)
-                strings.remove(s1)
-                strings.remove(s2)
-                overlap = computeOverlap(s1, s2)
-		strings.append(s1[:overlap[1]] + s2) 
-		if strings[-1] not in substringSubstringIndices:
-			substringSubstringIndices[strings[-1]] = []
-		substringSubstringIndices[strings[-1]] += substringSubstringIndices[s1] + [i + overlap[1] for i in substringSubstringIndices[s2]]
+        strings = list(Ss)
+	# the indices at which input strings start in each string, kept by
+	# index so that equal strings do not share them
+	substringSubstringIndices = [[0] for s in strings]
+
+	# Overlaps of all pairs of strings are computed once and kept in a
+	# heap in the order used by pairWithMaximumOverlap: most overlap,
+	# then latest first string, then latest second string. Strings are
+	# never moved, merged strings get the next index, and the two
+	# strings merged (not just equal copies of them) are marked dead so
+	# their heap entries are skipped. Pairs with no
+	# overlap are left out of the heap; once it runs dry the last two
+	# live strings are merged, as pairWithMaximumOverlap would do.
+	# Live strings are walked with the successor structure of
+	# findNextAlive, whose last entry is a sentinel.
+	failures = [computeFailureFunction(s) for s in strings]
+	alive = bytearray([1]) * len(strings)
+	nextAlive = range(len(strings) + 1)
+	heap = []
+	for j in xrange(len(strings)):
+		for i in xrange(j):
+			overlap = computeOverlap(strings[i], strings[j], failures[j])[0]
+			if overlap > 0:
+				heap.append((-overlap, -i, -j))
+	heapq.heapify(heap)
+
+	remaining = len(strings)
+	while (remaining > 1):
+		while heap and not (alive[-heap[0][1]] and alive[-heap[0][2]]):
+			heapq.heappop(heap)
+		if heap:
+			i, j = -heap[0][1], -heap[0][2]
+		else:
+			j = len(strings) - 1
+			while not alive[j]:
+				j -= 1
+			i = j - 1
+			while not alive[i]:
+				i -= 1
+		s1, s2 = strings[i], strings[j]
+		for x in (i, j):
+			alive[x] = 0
+			nextAlive[x] = x + 1
+		overlap = computeOverlap(s1, s2, failures[j])[1]
+		merged = s1[:overlap] + s2
+		k = len(strings)
+		strings.append(merged)
+		failures.append(computeFailureFunction(merged))
+		substringSubstringIndices.append(substringSubstringIndices[i] + [start + overlap for start in substringSubstringIndices[j]])
+		alive.append(1)
+		nextAlive.append(k + 1) # k takes over the old sentinel
+		x = findNextAlive(nextAlive, 0)
+		while x < k:
+			mergedOverlap = computeOverlap(strings[x], merged, failures[k])[0]
+			if mergedOverlap > 0:
+				heapq.heappush(heap, (-mergedOverlap, -x, -k))
+			x = findNextAlive(nextAlive, x + 1)
+		remaining -= 1
 
 	# break it into the sequence
-	superstring = strings[0]
-	substringIndices = substringSubstringIndices[superstring]
+	last = findNextAlive(nextAlive, 0)
+	superstring = strings[last]
+	substringIndices = substringSubstringIndices[last]
 	substringIndices = [0] + substringIndices + [len(superstring)]
 	substringIndices = list(set(substringIndices)) # remove duplicates
 	substringIndices.sort()
@@ -119,24 +252,29 @@ def blumSmallestSuperstringAndBreaking(Ss):
 
 """
 Description:
-Modifies a list of strings by breaking strings at their midpoint
-if they exceed an input length.
+Breaks the strings of a list at their midpoint if they
+exceed an input length.
 
 Input:
 A list of strings and a threshold length.
 
 Output:
-Nothing. The input string list is modified by removing strings
-that are too long and replacing them with two halves.
+A new list in which the strings that are too long are replaced
+by their two halves. The lengths are computed once up front, and
+if none is too long the strings are copied over as they are.
 """
 def splitTooBigs(strings, split_len):
+        lengths = map(len, strings)
+        if not lengths or max(lengths) <= split_len:
+                return list(strings)
         result = []
-        for s in strings: # Compute images of excessively-long strings  
-                if len(s) > split_len:
-                        result.append(s[:len(s)/2]) 
-                        result.append(s[len(s)/2:]) 
+        append = result.append
+        for s, length in zip(strings, lengths): # Compute images of excessively-long strings  
+                if length > split_len:
+                        append(s[:length//2]) 
+                        append(s[length//2:]) 
                 else:
-                        result.append(s)
+                        append(s)
         return result        
 
 """
@@ -164,6 +302,25 @@ def generateCs(S):
         return Cs
 
 
+"""
+Description:
+Concatenates a sequence of strings and records where each of them starts,
+so that the concatenation of S[a:b] is joined[offsets[a]:offsets[b]].
+
+Input:
+A sequence of strings S.
+
+Output:
+A pair containing the concatenation of S and a list of the len(S) + 1
+offsets in it at which the strings of S start (the last being its length).
+"""
+def joinWithOffsets(S):
+	offsets = [0]
+	for s in S:
+		offsets.append(offsets[-1] + len(s))
+	return ("".join(S), offsets)
+
+
 """
 Description:
 Finds where a string occurs in a sequence of smaller strings and
@@ -172,28 +329,33 @@ prefix of the string, along with the length of the prefix.
 
 Input:
 A string and a sequence of smaller strings whose concatenation is 
-a superstring of the input string.
+a superstring of the input string, optionally along with the result
+of joinWithOffsets for the smaller strings.
 
 Output:
 A triple specifying the indices of the first and last strings in
 the sequence whose concatenation contains the longest prefix of 
 input string, along with the length of this prefix.
 """
-def findLongestPrefix(s, small_strings):
-
-	def findPrefixStart():
-		for i in xrange(len(small_strings)):
-			if s == ("".join(small_strings[i:]))[:len(s)]: # if s is a prefix 
-				return i
+def findLongestPrefix(s, small_strings, joined=None, offsets=None):
+	if joined is None:
+		joined, offsets = joinWithOffsets(small_strings)
+
+	# the first occurrence of s in the concatenation that starts
+	# where one of the smaller strings does; after a misaligned hit
+	# the search resumes at the next boundary, skipping any other
+	# occurrences before it
+	start = joined.find(s)
+	sPrefixStart = bisect.bisect_left(offsets, start)
+	while start != -1 and offsets[sPrefixStart] != start:
+		start = joined.find(s, offsets[sPrefixStart])
+		sPrefixStart = bisect.bisect_left(offsets, start)
+	if start == -1 or sPrefixStart == len(small_strings):
 		raise Exception, "String not found as a prefix"
 
-	sPrefixStart = findPrefixStart()
-	sPrefixEnd = sPrefixStart
-	remSLen = len(s)
-	while sPrefixEnd < len(small_strings) and len(small_strings[sPrefixEnd]) <= remSLen:
-		remSLen -= len(small_strings[sPrefixEnd])
-		sPrefixEnd += 1
-        return (sPrefixStart, sPrefixEnd, len(s) - remSLen) 
+	# the last smaller string that ends within s
+	sPrefixEnd = bisect.bisect_right(offsets, start + len(s)) - 1
+        return (sPrefixStart, sPrefixEnd, offsets[sPrefixEnd] - start) 
 
 """
 Description:
@@ -212,25 +374,47 @@ non-terminals/terminals (also strings).
 """
 def generateSubstringConstructionGrammar(S):
 
-        def recursiveCall(S, grammar):
-                if len(S) == 1:
-                        return
-                for i in xrange(len(S)/2-1):
-                        grammar["".join(S[i:len(S)/2])] = [S[i], "".join(S[i+1:len(S)/2])]
-                for i in xrange(len(S)/2+1, len(S)):
-                        grammar["".join(S[len(S)/2:i+1])] = ["".join(S[len(S)/2:i]), S[i]]
-                recursiveCall(S[:len(S)/2], grammar)
-                recursiveCall(S[len(S)/2:], grammar)
+	# Every nonterminal is a run of consecutive strings of S, i.e. a
+	# slice of their concatenation between two of the offsets at
+	# which the strings start.
+	joined, offsets = joinWithOffsets(S)
+
+	def recursiveCall(lo, hi, grammar):
+		if hi - lo <= 1:
+			return
+		mid = lo + (hi - lo) / 2
+		rhs = S[mid-1]
+		for i in xrange(mid-2, lo-1, -1):
+			lhs = joined[offsets[i]:offsets[mid]]
+			grammar[lhs] = [S[i], rhs]
+			rhs = lhs
+		lhs = S[mid]
+		for i in xrange(mid+1, hi):
+			rhs = lhs
+			lhs = joined[offsets[mid]:offsets[i+1]]
+			grammar[lhs] = [rhs, S[i]]
+		recursiveCall(lo, mid, grammar)
+		recursiveCall(mid, hi, grammar)
 
-        grammar = {}
-        recursiveCall(S, grammar)
-        return grammar 
+	grammar = {}
+	recursiveCall(0, len(S), grammar)
+	return grammar 
 
 """
 The algorithm, the myth, the legend.
 """
 def getLehman1Grammar(S):
 
+	# Work on a byte string, if S is ASCII, so every intermediate string
+	# costs one byte per symbol. ASCII byte strings compare and hash
+	# equal to their unicode originals, so callers can still index the
+	# grammar with either. Other unicode input is used as it is.
+	if str is bytes and isinstance(S, unicode):
+		try:
+			S = S.encode('ascii')
+		except UnicodeEncodeError:
+			pass
+
 	# Get the C_k sequence 
         Cs = generateCs(S)
 	
@@ -239,6 +423,7 @@ def getLehman1Grammar(S):
 	for C in Cs:
 		grammar.update(generateSubstringConstructionGrammar(C))
 	grammar.update(generateSubstringConstructionGrammar([char for char in S]))
+	joinedCs = [joinWithOffsets(C) for C in Cs]
 
 	# For each string, find its decomposition into sequences of nonterminals
 	# from each C_k and use the substring construction to create <= 2
@@ -250,8 +435,10 @@ def getLehman1Grammar(S):
 				continue
 			sRemainder = s
 			grammar[s] = []
-			for C in Cs[i+1:]:
-				start, end, used = findLongestPrefix(sRemainder, C)
+			for level in xrange(i+1, len(Cs)):
+				C = Cs[level]
+				joined, offsets = joinedCs[level]
+				start, end, used = findLongestPrefix(sRemainder, C, joined, offsets)
 				if (start == end):
 					continue
 				elif (start + 1 == end):
@@ -263,8 +450,8 @@ def getLehman1Grammar(S):
 					sRemainder = sRemainder[used:] 
 				else:
 					for split in xrange(start + 1, end):
-						half1 = "".join(C[start:split])			
-						half2 = "".join(C[split:end])
+						half1 = joined[offsets[start]:offsets[split]]
+						half2 = joined[offsets[split]:offsets[end]]
 						if ((split == start + 1 or half1 in grammar) and
 							(split == end - 1 or half2 in grammar)):
 							break			
@@ -304,6 +491,26 @@ class Test__computeOverlap(unittest.TestCase):
                 self.assertEquals(computeOverlap("bcd", "abcde"), (0, 3, 0))
                 self.assertEquals(computeOverlap("ab", "ababab"), (0, 2, 0))
 
+        def test6(self):
+                self.assertEquals(computeOverlap("abab", "abab"), (2, 2, 0))
+                self.assertEquals(computeOverlap("aabaab", "aabaab"), (3, 3, 0))
+                self.assertEquals(computeOverlap("abaab", "aba"), (2, 3, 0))
+
+        def test7(self):
+                for s1, s2 in [("abc", "bcd"), ("abc", "abc"), ("abab", "abab"),
+                        ("aabaab", "aabaab"), ("abaab", "aba"), ("bcd", "abcde")]:
+                        self.assertEquals(computeOverlap(s1, s2, computeFailureFunction(s2)),
+                                computeOverlap(s1, s2))
+
+
+class Test__computeFailureFunction(unittest.TestCase):
+
+        def test1(self):
+                self.assertEquals(computeFailureFunction(""), [])
+                self.assertEquals(computeFailureFunction("abc"), [0, 0, 0])
+                self.assertEquals(computeFailureFunction("aaaa"), [0, 1, 2, 3])
+                self.assertEquals(computeFailureFunction("abacaba"), [0, 0, 1, 0, 1, 2, 3])
+
 
 class Test__pairWithMaximumOverlap(unittest.TestCase):
 
@@ -312,6 +519,16 @@ class Test__pairWithMaximumOverlap(unittest.TestCase):
                 self.assertEquals(pairWithMaximumOverlap(["abc", "def", "ghi", "jkl", "efg"]), ("def", "efg"))
                 self.assertEquals(pairWithMaximumOverlap(["abc", "def", "ghi", "jkl", "def", "bcz"]), ("abc", "bcz"))
 
+class Test__findNextAlive(unittest.TestCase):
+
+        def test1(self):
+                nextAlive = [0, 2, 3, 3, 4, 5]
+                self.assertEquals(findNextAlive(nextAlive, 0), 0)
+                self.assertEquals(findNextAlive(nextAlive, 1), 3)
+                self.assertEquals(findNextAlive(nextAlive, 2), 3)
+                self.assertEquals(findNextAlive(nextAlive, 5), 5)
+                self.assertEquals(nextAlive[1], 3)
+
 class Test__blumSmallestSuperstringAndBreaking(unittest.TestCase):
 
         def test1(self):
@@ -327,6 +544,14 @@ class Test__blumSmallestSuperstringAndBreaking(unittest.TestCase):
                 self.assertEquals(blumSmallestSuperstringAndBreaking(["abc", "ab"]), ["abc", "ab"])
                 self.assertEquals(blumSmallestSuperstringAndBreaking(["ab", "abc"]), ["ab", "abc"])
 
+        def test4(self):
+                # the merged strings themselves are removed, not earlier equal copies
+                self.assertEquals(blumSmallestSuperstringAndBreaking(["b", "a", "a", "b"]), ["b", "a", "a", "b"])
+
+        def test5(self):
+                # equal strings keep their own start indices
+                self.assertEquals(blumSmallestSuperstringAndBreaking(["ba", "b", "a"]), ["ba", "b", "a"])
+
 class Test__splitTooBigs(unittest.TestCase):
 
         def test1(self):
@@ -337,6 +562,12 @@ class Test__splitTooBigs(unittest.TestCase):
         def test2(self):
              	self.assertEquals(splitTooBigs(["abcd"], 2), ["ab", "cd"])
 
+        def test3(self):
+                self.assertEquals(splitTooBigs([], 2), [])
+                strings = ["ab", "c", "de"]
+                self.assertEquals(splitTooBigs(strings, 2), strings)
+                self.assertFalse(splitTooBigs(strings, 2) is strings)
+
 class Test__generateCs(unittest.TestCase):
 
         def test1(self):
@@ -371,6 +602,12 @@ class Test__findLongestPrefix(unittest.TestCase):
 	def test3(self):
 		self.assertEquals(findLongestPrefix("abcde", ["abcd", "qq", "abc", "d", "ef"]), (2, 4, 4))
 
+class Test__joinWithOffsets(unittest.TestCase):
+
+	def test1(self):
+		self.assertEquals(joinWithOffsets([]), ("", [0]))
+		self.assertEquals(joinWithOffsets(["ab", "c", "def"]), ("abcdef", [0, 2, 3, 6]))
+
 class Test__generateSubstringConstructionGrammar(unittest.TestCase):
 
         def test1(self):
@@ -455,6 +692,15 @@ class Test__getLehman1Grammar(unittest.TestCase):
 				print s
 				self.assertTrue(False)
 
+	def test8(self):
+		grammar = getLehman1Grammar(u"abab")
+		self.assertEquals(grammar[u"abab"], ["ab", "ab"])
+		self.assertTrue(all(type(k) is str for k in grammar))
+
+	def test9(self):
+		grammar = getLehman1Grammar(u"h\xe9llo\xe9llo")
+		self.assertEquals(grammar[u"h\xe9llo\xe9llo"], [u"h\xe9ll", u"o\xe9llo"])
+
 if __name__ == '__main__':
         unittest.main()
 
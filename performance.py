@@ -10,7 +10,20 @@ import matplotlib.pyplot
 
 def grammarSize(G):
 	# the sum of the number of right-hand size symbols for all rules
-	return sum([len(v) for v in G.values()])
+	return sum(map(len, G.values()))
+
+def randomString(n):
+	return "".join(map(random.choice, [string.letters] * n))
+
+def memoizeGrammarFunction(grammarFunction):
+	# Reuses the grammar of a string seen before instead of rebuilding it.
+	# Only for measuring grammar sizes: a cache hit would spoil a timing.
+	grammars = {}
+	def memoized(S):
+		if S not in grammars:
+			grammars[S] = grammarFunction(S)
+		return grammars[S]
+	return memoized
 	
 def algorithmAsymptoticPerformance(grammarFunction):
 	sampleSize = 10
@@ -18,12 +31,12 @@ def algorithmAsymptoticPerformance(grammarFunction):
 	grammar_size = []
 	times = []
 	for n in xrange(10, 201, 10):
-		total = 0
+		# generate the inputs up front so only the algorithm is timed
+		samples = [randomString(n) for i in xrange(sampleSize)]
 		startTime = time.time()
-		for i in xrange(sampleSize):
-			S = "".join([random.choice(string.letters) for c in xrange(n)])
-			total += grammarSize(grammarFunction(S))
+		grammars = [grammarFunction(S) for S in samples]
 		endTime = time.time()
+		total = sum(map(grammarSize, grammars))
 		string_size.append(n)
 		grammar_size.append(total / float(sampleSize))
 		times.append((endTime-startTime) / float(sampleSize)) 
@@ -32,8 +45,9 @@ def algorithmAsymptoticPerformance(grammarFunction):
 def algorithmSmallStringPerformance():
 	n = 1024	
 	print "bisection lehman1 sakamoto"
-	algorithms = [bisection.getBisectionGrammar, lehman1.getLehman1Grammar,
-				sakamoto.getSakamotoGrammar]
+	algorithms = [memoizeGrammarFunction(function) for function in
+				[bisection.getBisectionGrammar, lehman1.getLehman1Grammar,
+				sakamoto.getSakamotoGrammar]]
 	for i in xrange(100):
 		S = "".join(['a' for c in xrange(n)])
 		print [grammarSize(function(S)) for function in algorithms]
@@ -10,8 +10,19 @@ LNCS 2676, 348--360.
 """
 
 import unittest
-import copy
 import operator
+from collections import Counter
+from itertools import islice
+
+try:
+	intern
+except NameError:
+	from sys import intern
+
+try:
+	xrange
+except NameError:
+	xrange = range
 
 
 """
@@ -28,10 +39,91 @@ Output:
 A grammar (dictionary) and start symbol (string) that produce exactly the sequence. 
 """
 def produceTrivialGrammar(w):
-        P = {}
-	for i in xrange(2, len(w)+1):
-		P["".join(w[:i])] = ["".join(w[:i-1]), w[i-1]]
-        return P
+	P = {}
+	if len(w) == 0:
+		return P
+	# each prefix is built from, and shares its rule with, the last one
+	prefix = w[0]
+	for i in xrange(1, len(w)):
+		longer = prefix + w[i]
+		P[longer] = [prefix, w[i]]
+		prefix = longer
+	return P
+
+"""
+Description:
+Collects the symbols and production rules built up by levelwiseRepair.
+Each symbol (terminal or non-terminal) is given an integer id, and the
+rule of a non-terminal is stored as the ids of its two right-hand side
+symbols. A non-terminal is identified by its rule, so building the same
+pair of symbols twice gives the same id. The string it produces is only
+worked out when it is asked for.
+"""
+class GrammarBuilder(object):
+
+	def __init__(self):
+		self.terminals = {} # terminal (string) -> id
+		self.pairs = {} # (left id, right id) -> id
+		self.rhs = [] # id -> (left id, right id), or None for a terminal
+		self.names = [] # id -> string produced, or None if not worked out
+		self.named = 0 # the names of all ids below this are worked out
+
+	# the id of a terminal, added if it is new
+	def terminal(self, a):
+		if a in self.terminals:
+			return self.terminals[a]
+		self.terminals[a] = len(self.rhs)
+		self.rhs.append(None)
+		self.names.append(a)
+		return len(self.rhs) - 1
+
+	# the id of the non-terminal with rule l r, added if it is new
+	def rule(self, l, r):
+		if (l, r) in self.pairs:
+			return self.pairs[(l, r)]
+		self.pairs[(l, r)] = len(self.rhs)
+		self.rhs.append((l, r))
+		self.names.append(None)
+		return len(self.rhs) - 1
+
+	# the id of the non-terminal for the symbol a repeated k >= 2 times,
+	# added if new with the rules described on page 5 of [1]:
+	# a^k -> a^{k/2}a^{k/2} (k even), a^k -> a^{k-1}a (k odd)
+	def repeat(self, a, k):
+		ks = []
+		while k > 1:
+			ks.append(k)
+			if k % 2 == 0:
+				k = k // 2
+			else:
+				k = k - 1
+		A = a
+		for k in reversed(ks):
+			if k % 2 == 0:
+				A = self.rule(A, A)
+			else:
+				A = self.rule(A, a)
+		return A
+
+	# the string produced by symbol i
+	def name(self, i):
+		# a rule's symbols were all added before it, so names can
+		# be worked out in order of id
+		while self.named <= i:
+			if self.names[self.named] is None:
+				l, r = self.rhs[self.named]
+				self.names[self.named] = self.names[l] + self.names[r]
+			self.named += 1
+		return self.names[i]
+
+	# the grammar (dictionary) of all the rules; distinct non-terminals
+	# producing the same string share an entry
+	def grammar(self):
+		P = {}
+		for i in xrange(len(self.rhs)):
+			if self.rhs[i] is not None:
+				P[self.name(i)] = [self.name(self.rhs[i][0]), self.name(self.rhs[i][1])]
+		return P
 
 """
 Description (pseudocode):
@@ -49,23 +141,40 @@ end.
 notation: X \leftarrow Y denotes the addition of the set Y to X.
 """
 def levelwiseRepair(w):
-        w = copy.copy(w)
-        w = list(w)
-        P = {} # A dictionary of production rules
-        ID = set() #creates a set of ids
-        while (hasRepeatingPairs(w)):
-                # "P \leftarrow repetition(w, N);  (replacing all repetitions)"
-                P.update(repetition(w))
-                # "P \leftarrow arrangement(w, N); (replacing frequent pairs)"
-                P.update(arrangement(w, ID))
-        if (len(w) == 1):
-                return P
-        else:
-                start_grammar = produceTrivialGrammar(w)
-                P.update(start_grammar)
-                return P
+	# w holds the ids of its symbols; the rules go into G
+	G = GrammarBuilder()
+	w = [G.terminal(a) for a in w]
+	ID = set() #creates a set of ids
+	while True:
+		# The pair counts answer the loop condition: the list is
+		# sorted by count, so some pair repeats iff the first does.
+		positions = findSegmentPositions(w)
+		L = createSortedSegmentList(w, positions)
+		if len(L) == 0 or L[0][0] < 2:
+			break
+		# "P \leftarrow repetition(w, N);  (replacing all repetitions)"
+		if replaceRepetitions(w, G) > 0:
+			# w changed, so the counts have to be redone
+			positions = findSegmentPositions(w)
+			L = createSortedSegmentList(w, positions)
+		# "P \leftarrow arrangement(w, N); (replacing frequent pairs)"
+		replaceSegments(w, ID, L, positions, G)
+	P = G.grammar() # A dictionary of production rules
+	if (len(w) == 1):
+		return P
+	else:
+		start_grammar = produceTrivialGrammar([G.name(a) for a in w])
+		P.update(start_grammar)
+		return P
 
 def getSakamotoGrammar(S):
+	# Encode ASCII unicode input so the keys of the grammar returned
+	# are str; other unicode input is used as it is.
+	if str is bytes and isinstance(S, unicode):
+		try:
+			S = S.encode('ascii')
+		except UnicodeEncodeError:
+			pass
 	return levelwiseRepair(S)
 
 """
@@ -85,7 +194,7 @@ symbols occurring more than once in the sequence.
 """
 def hasRepeatingPairs(w):
 	sequences = set()
-        for i in xrange(len(w) - 1):
+	for i in xrange(len(w) - 1):
 		pair = (w[i], w[i+1])
 		if pair in sequences:
 			return True
@@ -107,20 +216,59 @@ procedure repetition(w, N):
 end
 """
 def repetition(w):
-        # "initialize P = \emptyset;"
-        P = {}
-        # "while (there exists w[i, i+j] = a^+) do {"
-        while (hasRepeatingSymbol(w)):
-		i, j = hasRepeatingSymbol(w)
-                A_a_j = w[i] * (j - i + 1)
-                # "replace w[i, i+j] by A_{(a, j)};"
-		for r in xrange(i, j+1):
-			w.pop(i)
-		w.insert(i, A_a_j)
-                # "P \leftarrow {A_{(a, j)} \rightarrow BC} and N \leftarrow {A_{(a, j)}, B, C} recursively;"
-                produceRepeatingSymbolGrammar(P, A_a_j)
-        # "return P;"
-        return P
+	# the repetitions are replaced over ids, as levelwiseRepair does
+	G = GrammarBuilder()
+	ids = [G.terminal(a) for a in w]
+	replaceRepetitions(ids, G)
+	w[:] = [G.name(a) for a in ids]
+	return G.grammar()
+
+"""
+Description:
+Does the work of repetition on a sequence of the ids of the symbols
+of a GrammarBuilder.
+
+Input:
+A list w of ids and the GrammarBuilder G they belong to. The
+new symbols and rules are added to G.
+
+Output:
+The number of repetitions replaced.
+"""
+def replaceRepetitions(w, G):
+	# "initialize P = \emptyset;"
+	replaced = 0
+	# "while (there exists w[i, i+j] = a^+) do {"
+	# Runs are replaced in one left-to-right pass, building the new
+	# sequence in new_w. Everything in new_w is free of runs, so the
+	# only run a replacement can create is with the symbol before it
+	# (the end of new_w) or the symbols after it (the rest of w), and
+	# the run is extended to take those in before being replaced.
+	new_w = []
+	n = len(w)
+	i = 0
+	while i < n:
+		A_a_j = w[i]
+		k = 1
+		i += 1
+		while True:
+			while i < n and w[i] == A_a_j:
+				k += 1
+				i += 1
+			if len(new_w) > 0 and new_w[-1] == A_a_j:
+				new_w.pop()
+				k += 1
+			if k == 1:
+				break
+			# "replace w[i, i+j] by A_{(a, j)};"
+			# "P \leftarrow {A_{(a, j)} \rightarrow BC} and N \leftarrow {A_{(a, j)}, B, C} recursively;"
+			A_a_j = G.repeat(A_a_j, k)
+			k = 1
+			replaced += 1
+		new_w.append(A_a_j)
+	w[:] = new_w
+	# "return P;"
+	return replaced
 	
 
 """
@@ -140,20 +288,14 @@ Either an 2-tuple with the start and end of the
 repeating sequence (both inclusive), or None.
 """
 def hasRepeatingSymbol(w):
-	
-	def findMaxRepeating(w, i):
-		j = i+1
-		while j < len(w) and w[j] == w[i]:
-			j += 1
-		return (i, j-1)
-
-	if len(w) < 2:
-		return None
-
-	for i in xrange(len(w)-1):
-		r = findMaxRepeating(w, i)	
-		if r[0] != r[1]:
-			return r
+	# scan for the first symbol equal to its predecessor, then for the
+	# end of its run
+	for i in xrange(1, len(w)):
+		if w[i] == w[i-1]:
+			j = i
+			while j+1 < len(w) and w[j+1] == w[i]:
+				j += 1
+			return (i-1, j)
 	return None
 
 #creates production rules and adds them to P, adds non-terminals to N
@@ -173,19 +315,25 @@ A^k -> A^{k-1}A if k >= 3 and odd
 A^k -> A^2 if k == 2
 """
 def produceRepeatingSymbolGrammar(P, S):
-	if len(S) == 2:
-		P[S] = [S[0], S[1]]
-	elif (len(S) % 2 == 0):
-		rhs1 = S[:len(S)/2]
-		rhs2 = S[len(S)/2:]
-		P[S] = [rhs1, rhs2]
-		produceRepeatingSymbolGrammar(P, rhs1)	
-		produceRepeatingSymbolGrammar(P, rhs2)	
-	else:
-		rhs1 = S[:len(S)-1]
-		rhs2 = S[len(S)-1]
-		P[S] = [rhs1, rhs2]
-		produceRepeatingSymbolGrammar(P, rhs1)	
+	# The two halves of an even string are often the same string (always
+	# for runs of a single character), and are then only expanded once.
+	stack = [S]
+	while len(stack) > 0:
+		S = stack.pop()
+		if len(S) == 2:
+			P[S] = [S[0], S[1]]
+		elif (len(S) % 2 == 0):
+			rhs1 = intern(S[:len(S)//2])
+			rhs2 = intern(S[len(S)//2:])
+			P[S] = [rhs1, rhs2]
+			stack.append(rhs1)
+			if rhs2 is not rhs1:
+				stack.append(rhs2)
+		else:
+			rhs1 = intern(S[:len(S)-1])
+			rhs2 = S[len(S)-1]
+			P[S] = [rhs1, rhs2]
+			stack.append(rhs1)
 
 """
 arrangement()
@@ -207,89 +355,117 @@ procedure arrangement(w, N)
 	replace all segments in D by appropriate nonterminals;
 	return the set P of production rules computed by D and update N by P;
 end.
-
 """
 def arrangement(w, ID):
-        D = {} #saves segments and their ids in the form (i, i+1):id
-        L = createSortedSegmentList(w)
-        P = {}
-        Assignments = {}
-        while (len(L) > 0):
-                #pops most frequent
-                segment = L.pop(0)[1]
-
-                #sets ids {d_1, d_2} equal to next two numbers in order
-                id1 = len(ID)
-                ID.add(id1)
-                id2 = id1 + 1
-                ID.add(id2)
+	# the pairs are replaced over ids, as levelwiseRepair does
+	G = GrammarBuilder()
+	ids = [G.terminal(a) for a in w]
+	positions = findSegmentPositions(ids)
+	replaceSegments(ids, ID, createSortedSegmentList(ids, positions), positions, G)
+	w[:] = [G.name(a) for a in ids]
+	return G.grammar()
+
+"""
+Description:
+Does the work of arrangement on a sequence of the ids of the symbols
+of a GrammarBuilder.
+
+Input:
+A list w of ids, the set of ids ID given out so far, the frequency
+list L and the positions of each pair of w (as returned by
+createSortedSegmentList and findSegmentPositions), and the
+GrammarBuilder G the ids belong to. The new symbols and rules are
+added to G.
+
+Output:
+The number of segments replaced.
+"""
+def replaceSegments(w, ID, L, positions, G):
+	D = {} #saves segments and their ids in the form (i, i+1):id
+	Assignments = {}
+	Members = {} #the segments assigned each id, in the form id:[(i, i+1), ...]
+	Subgroups = {} #the results of subgroup, in the form id:result
+	# L is walked once from the most frequent segment down; stepping
+	# through it rather than popping its head keeps this linear
+	for count, segment in L:
+
+		#sets ids {d_1, d_2} equal to next two numbers in order
+		id1 = len(ID)
+		ID.add(id1)
+		id2 = id1 + 1
+		ID.add(id2)
 		
-                #gets sets
-                C = make_set_c(segment, w)
-                Free = set() #saves sets of segments as (i, i+1)
-                Left = set()
-                Right = set()
-                make_sets(w, C, Free, Left, Right, Assignments)
+		#gets sets
+		C = set()
+		for i in positions[segment]:
+			C.add((i, i+1))
+		Free = set() #saves sets of segments as (i, i+1)
+		Left = set()
+		Right = set()
+		make_sets(w, C, Free, Left, Right, Assignments)
 	
-                #add segments to D
-                D.update(assignment(Free, Free, Left, Right, Assignments, id1, id2, w, D))
-                D.update(assignment(Left, Free, Left, Right, Assignments, id1, id2, w, D))
-                D.update(assignment(Right, Free, Left, Right, Assignments, id1, id2, w, D))
-
-        #replace segments with non-terminals
-        values = D.values()
-        for v in values: #remove duplicates
-                while values.count(v) > 1:
-                        values.remove(v)
-
-        segments = set()
-        for v in values:
-                for x in D:
-                        if D[x] == v:
-                                segments.add((w[x[0]], w[x[1]]))
-
-        for s in segments:
-                # find locations that the segment occurs 
-                locs = []
-                for i in xrange(len(w) - 1):
-                        if (w[i], w[i+1]) == s:
-                                locs.append(i)
-		# replace the segment by a nonterminal
-                for l in locs:
-                        w[l] = s[0] + s[1]
-                for li in xrange(len(locs)):
-                        w.pop(locs[li] - li + 1)
-		# add to the grammar 
-                P[s[0] + s[1]] = [s[0], s[1]]
-
-        #return the set P of production rules computed by D
-        return P
+		#add segments to D
+		D.update(assign_free(Free, Assignments, Members, id1))
+		D.update(assign_left(Left, Assignments, Members, Subgroups, id1, id2, w, D))
+		D.update(assign_right(Right, Assignments, Members, Subgroups, id1, id2, w, D))
+
+	#replace segments with non-terminals
+	# every position in D has an id, so each one's segment is replaced,
+	# wherever it occurs: all of them at once, in one pass over w
+	segments = set()
+	for x in D:
+		segments.add((w[x[0]], w[x[1]]))
+
+	new_w = []
+	# bound once, as this loop runs over all of w
+	append = new_w.append
+	rule = G.rule
+	n = len(w)
+	replaced = 0
+	i = 0
+	while i < n - 1:
+		if (w[i], w[i+1]) in segments:
+			append(rule(w[i], w[i+1]))
+			replaced += 1
+			i += 2
+		else:
+			append(w[i])
+			i += 1
+	if i < n:
+		append(w[i])
+	w[:] = new_w
+
+	#the rules of the segments replaced are in G
+	return replaced
 	
-#makes the list of segments and sorts them by count
-def createSortedSegmentList(w):
+#makes the list of segments and sorts them by count, taking the
+#counts from the segments' positions if those are given
+def createSortedSegmentList(w, positions=None):
 	# compute counts
-	segmentCounts = {}
-        for i in xrange(len(w) - 1):
-                segment = (w[i], w[i+1])
-		if segment in segmentCounts:
-			segmentCounts[segment] += 1
-		else:
-			segmentCounts[segment] = 1
+	if positions is None:
+		segmentCounts = Counter(zip(w, islice(w, 1, None)))
+	else:
+		segmentCounts = dict((segment, len(positions[segment])) for segment in positions)
 
 	# create a sorted list
-        segmentList = []
-	for segment in segmentCounts:
-		segmentList.append((segmentCounts[segment], segment))
-        segmentList.sort() 
-        segmentList.reverse()
-        return segmentList
-	
-def make_set_c(seg, w):
-	C = set()
+	segmentList = [(segmentCounts[segment], segment) for segment in segmentCounts]
+	segmentList.sort() 
+	segmentList.reverse()
+	return segmentList
+
+#maps each segment to the (increasing) list of positions i at which
+#it starts, i.e. with (w[i], w[i+1]) == segment
+def findSegmentPositions(w):
+	positions = {}
+	get = positions.get
 	for i in xrange(len(w)-1):
-		if (w[i], w[i+1]) == seg:
-			C.add((i, i+1))
-	return C
+		segment = (w[i], w[i+1])
+		p = get(segment)
+		if p is None:
+			positions[segment] = [i]
+		else:
+			p.append(i)
+	return positions
 	
 # compute F: neither right or left aligned
 # compute L: w[i-1, i] is assigned an id
@@ -297,77 +473,93 @@ def make_set_c(seg, w):
 def make_sets(w, C, F, L, R, Assignments):
 	for x in C:
 		i = x
-		if i[0] - 1 > 0 and Assignments.has_key((i[0]-1, i[0])):
+		if i[0] - 1 > 0 and (i[0]-1, i[0]) in Assignments:
 			L.add(i)
-		elif i[0] + 2 < len(w) and Assignments.has_key((i[0]+1, i[0]+2)):
+		elif i[0] + 2 < len(w) and (i[0]+1, i[0]+2) in Assignments:
 			R.add(i)
 		else:
 			F.add(i)
 
 
-def assignment(X, Free, Left, Right, assignments, d1, d2, w, dictionary):
+# records that segment x is assigned id d
+def set_assignment(x, d, assignments, members):
+	assignments[x] = d
+	if d in members:
+		members[d].append(x)
+	else:
+		members[d] = [x]
+
+# assigns every free segment d1
+def assign_free(Free, assignments, members, d1):
 	D = {}
-	if (X is Free):
-		for x in Free:
-			assignments[x] = d1
-			D[x] = d1
-	if(X is Left):
-		for x, y in Left:
-			leftseg = (x-1, x)
-			seq = (x, y)
-			if subgroup(leftseg, assignments, dictionary) == "irregular":	
-				assignments[seq] = d2
-			if subgroup(leftseg, assignments, dictionary) == "unselected":
-				assignments[seq] = d1
-				D[seq] = d1
-			if subgroup(leftseg, assignments, dictionary) == "selected":
-				if group_contents(leftseg, w, assignments, dictionary) == "irregular":
-					assignments[seq] = d2
-				elif group_contents(leftseg, w, assignments, dictionary) == "unselected":
-					assignments[seq] = d1
-				#Y contains an irregular subgroup
-				elif check_all(X, Left, Right, assignments, dictionary) == "irregular":
-					assignments[seq] = d2
-				else:
-					assignments[seq] = d1
-	
-	if (X is Right):
-		for x, y in Right:
-			rightseg = (y, y+1)
-			seq = (x, x+1)
-			if subgroup(rightseg, assignments, dictionary) == "irregular":	
-				assignments[seq] = d2
-			if subgroup(rightseg, assignments, dictionary) == "unselected":
-				assignments[seq] = d1
-				D[seq] = d1
-			if subgroup(rightseg, assignments, dictionary) == "selected":
-				if group_contents(rightseg, w, assignments, dictionary) == "irregular":
-					assignments[seq] = d2
-				elif group_contents(rightseg, w, assignments, dictionary) == "unselected":
-					assignments[seq] = d1
-				# Y contains an irregular subgroup
-				elif check_all(X, Left, Right, assignments, dictionary) == "irregular":		
-					assignments[seq] = d2
-				else:
-					assignments[seq] = d1
-	
+	for x in Free:
+		set_assignment(x, d1, assignments, members)
+		D[x] = d1
+	return D
+
+# assigns each left-fixed segment (x, y) by the subgroup of (x-1, x)
+def assign_left(Left, assignments, members, cache, d1, d2, w, dictionary):
+	fixed = []
+	for x, y in Left:
+		fixed.append(((x, y), (x-1, x)))
+	return assign_fixed(fixed, assignments, members, cache, d1, d2, w, dictionary)
+
+# assigns each right-fixed segment (x, y) by the subgroup of (y, y+1)
+def assign_right(Right, assignments, members, cache, d1, d2, w, dictionary):
+	fixed = []
+	for x, y in Right:
+		fixed.append(((x, x+1), (y, y+1)))
+	return assign_fixed(fixed, assignments, members, cache, d1, d2, w, dictionary)
+
+# the part of assign_left and assign_right they share: fixed is a list
+# of (segment, segment it is fixed to) pairs
+def assign_fixed(fixed, assignments, members, cache, d1, d2, w, dictionary):
+	D = {}
+	all_status = None # check_all(fixed, ...), computed when first needed
+	for seq, seg in fixed:
+		status = cached_subgroup(seg, assignments, members, dictionary, cache)
+		if status == "irregular":
+			set_assignment(seq, d2, assignments, members)
+		if status == "unselected":
+			set_assignment(seq, d1, assignments, members)
+			D[seq] = d1
+		if status == "selected":
+			contents = group_contents(seg, w, assignments, members, dictionary, cache)
+			if all_status is None and contents is None:
+				all_status = check_all(fixed, assignments, members, dictionary, cache)
+			if contents == "irregular":
+				set_assignment(seq, d2, assignments, members)
+			elif contents == "unselected":
+				set_assignment(seq, d1, assignments, members)
+			#Y contains an irregular subgroup
+			elif all_status == "irregular":
+				set_assignment(seq, d2, assignments, members)
+			else:
+				set_assignment(seq, d1, assignments, members)
 	return D
 	
+# subgroup, remembering the result for each id in cache. Only ids given
+# out for earlier segments are asked about, and their subgroups do not
+# change again while arrangement runs.
+def cached_subgroup(a, assignments, members, D, cache):
+	index = assignments[a]
+	if index not in cache:
+		cache[index] = subgroup(a, assignments, members, D)
+	return cache[index]
+
 #segment is in an irregular subgroup if, for all segments assigned that index, some are in D and some are not	
-def subgroup(a, assignments, D):
+def subgroup(a, assignments, members, D):
 	inD = False
 	ninD = False
 	index = assignments[a]				
-	for x in assignments:			
-		y = assignments[x]
-		# check to see if an entry is in the same subgroup
-		if y == index:						
-			#if there is an entry that has been added to D
-			if D.has_key(x):
-				inD = True
-			# if there is an entry with that id not added to D
-			if not D.has_key(x):			
-				ninD = True
+	# the entries in the same subgroup
+	for x in members[index]:
+		#if there is an entry that has been added to D
+		if x in D:
+			inD = True
+		# if there is an entry with that id not added to D
+		if x not in D:			
+			ninD = True
 	if inD and ninD:	
 		return "irregular"
 	if (not inD) and ninD:
@@ -375,30 +567,21 @@ def subgroup(a, assignments, D):
 	if inD and (not ninD):
 		return "selected"
 
-def group_contents(seg, w, assignments, dictionary):
+def group_contents(seg, w, assignments, members, dictionary, cache):
+	#determine the other ids for this segment: assignments holds a
+	#single id per segment, so seg's own subgroup is the one to check
 	otherseg = seg
-	#determine the other ids for this segment
-	for x in assignments:
-		y = assignments[x]
-		if x[0] == seg[0] and x[1] == seg[1]:
-			if y != assignments[seg]:
-				index = y
-				otherseg = (x)
 				
 	#check whether any subgroup with those indexes is an irregular subgroup
-	if subgroup(otherseg, assignments, dictionary) == "irregular":
+	if cached_subgroup(otherseg, assignments, members, dictionary, cache) == "irregular":
 		return "irregular"
-	if subgroup(otherseg, assignments, dictionary) == "unselected":
+	if cached_subgroup(otherseg, assignments, members, dictionary, cache) == "unselected":
 		return "unselected"
 	
-def check_all(a, Left, Right, assignments, dictionary):
-	for x, y in a:
-		if a is Left:
-			check = (x-1, x) #checking all left segments 
-		if a is Right:
-			check = (y, y+1)
+def check_all(fixed, assignments, members, dictionary, cache):
+	for seq, check in fixed: #checking all the segments fixed to
 		#if it has an irregular subgroup return irregular
-		if subgroup(check, assignments, dictionary) == "irregular":	
+		if cached_subgroup(check, assignments, members, dictionary, cache) == "irregular":	
 			return "irregular"
 	else:
 		return "other"
@@ -406,83 +589,150 @@ def check_all(a, Left, Right, assignments, dictionary):
 
 class Test__levelwiseRepair(unittest.TestCase):
 
-        def test1(self):
-               	levelwiseRepair('aaaaaabbbbbbbaaaaaa') 
-                levelwiseRepair('aaaadadvxcvdfdfg') 
-                levelwiseRepair('ghngngn') 
-                levelwiseRepair('aaaabbbbccccceeeeffffftttt') 
-                levelwiseRepair('ghaaaas') 
+	def test1(self):
+		levelwiseRepair('aaaaaabbbbbbbaaaaaa') 
+		levelwiseRepair('aaaadadvxcvdfdfg') 
+		levelwiseRepair('ghngngn') 
+		levelwiseRepair('aaaabbbbccccceeeeffffftttt') 
+		levelwiseRepair('ghaaaas') 
+
+class Test__getSakamotoGrammar(unittest.TestCase):
+
+	def test1(self):
+		grammar = getSakamotoGrammar(u'h\xe9h\xe9')
+		self.assertEqual(grammar[u'h\xe9h\xe9'], [u'h\xe9', u'h\xe9'])
+		self.assertEqual(grammar[u'h\xe9'], [u'h', u'\xe9'])
+
+class Test__GrammarBuilder(unittest.TestCase):
+
+	def test1(self):
+		G = GrammarBuilder()
+		a = G.terminal('a')
+		b = G.terminal('b')
+		self.assertEqual(G.terminal('a'), a)
+		ab = G.rule(a, b)
+		self.assertEqual(G.rule(a, b), ab)
+		self.assertEqual(G.rhs[ab], (a, b))
+		self.assertEqual(G.name(G.rule(ab, ab)), 'abab')
+		self.assertEqual(G.grammar(), {'abab': ['ab', 'ab'], 'ab': ['a', 'b']})
+
+	def test2(self):
+		G = GrammarBuilder()
+		a = G.terminal('a')
+		a5 = G.repeat(a, 5)
+		self.assertEqual(G.name(a5), 'aaaaa')
+		self.assertEqual(G.repeat(a, 5), a5)
+		self.assertEqual(G.grammar(), {'aaaaa': ['aaaa', 'a'],
+			'aaaa': ['aa', 'aa'], 'aa': ['a', 'a']})
+
+	def test3(self):
+		# the same string built two ways is two symbols
+		G = GrammarBuilder()
+		a = G.terminal('a')
+		b = G.terminal('b')
+		c = G.terminal('c')
+		ab_c = G.rule(G.rule(a, b), c)
+		a_bc = G.rule(a, G.rule(b, c))
+		self.assertNotEqual(ab_c, a_bc)
+		self.assertEqual(G.name(ab_c), G.name(a_bc))
 
 class Test__produceTrivialGrammar(unittest.TestCase):
 
 	def test1(self):
-		self.assertEquals({'abcd': ['abc', 'd'], 'abc': ['ab', 'c'], 'ab': ['a', 'b']}, 
+		self.assertEqual({'abcd': ['abc', 'd'], 'abc': ['ab', 'c'], 'ab': ['a', 'b']}, 
 			produceTrivialGrammar(['a', 'b', 'c', 'd']))
 
 class Test__hasRepeatingPairs(unittest.TestCase):
 
-        def test1(self):
-                self.assertFalse(hasRepeatingPairs('abcdefg'))
-                self.assertTrue(hasRepeatingPairs('aaaaaaa'))
-                self.assertFalse(hasRepeatingPairs('aabbcc'))
-                self.assertTrue(hasRepeatingPairs('abcdeab'))
-                self.assertTrue(hasRepeatingPairs('abab'))
+	def test1(self):
+		self.assertFalse(hasRepeatingPairs('abcdefg'))
+		self.assertTrue(hasRepeatingPairs('aaaaaaa'))
+		self.assertFalse(hasRepeatingPairs('aabbcc'))
+		self.assertTrue(hasRepeatingPairs('abcdeab'))
+		self.assertTrue(hasRepeatingPairs('abab'))
 
 class Test__repetition(unittest.TestCase):
 
-        def test1(self):        
-                w = ['a', 'a', 'a', 'a']
-                P = repetition(w)
-                self.assertEquals(w, ['aaaa']) 
-                self.assertEquals(P, {'aaaa': ['aa', 'aa'], 'aa': ['a', 'a']})
-
-        def test2(self):
-                w = ['a', 'a', 'b', 'a', 'a', 'b', 'b']
-                P = repetition(w)
-		self.assertEquals(w, ['aa', 'b', 'aa', 'bb'])
-                self.assertEquals(P, {'aa': ['a', 'a'], 'bb': ['b', 'b']})
+	def test1(self):        
+		w = ['a', 'a', 'a', 'a']
+		P = repetition(w)
+		self.assertEqual(w, ['aaaa']) 
+		self.assertEqual(P, {'aaaa': ['aa', 'aa'], 'aa': ['a', 'a']})
+
+	def test2(self):
+		w = ['a', 'a', 'b', 'a', 'a', 'b', 'b']
+		P = repetition(w)
+		self.assertEqual(w, ['aa', 'b', 'aa', 'bb'])
+		self.assertEqual(P, {'aa': ['a', 'a'], 'bb': ['b', 'b']})
                 
-        def test3(self):
-                w = ['a', 'b', 'a', 'b']
-                P = repetition(w)
-		self.assertEquals(w, ['a', 'b', 'a', 'b'])
-                self.assertEquals(P, {})
+	def test3(self):
+		w = ['a', 'b', 'a', 'b']
+		P = repetition(w)
+		self.assertEqual(w, ['a', 'b', 'a', 'b'])
+		self.assertEqual(P, {})
+
+	def test4(self):
+		# the non-terminal aa is not the terminal aa
+		w = ['aa', 'a', 'a', 'b']
+		P = repetition(w)
+		self.assertEqual(w, ['aa', 'aa', 'b'])
+		self.assertEqual(P, {'aa': ['a', 'a']})
                 
 class Test__createSortedSegmentList(unittest.TestCase):
 	
 	def test1(self):
 		L = createSortedSegmentList(['a', 'b', 'c', 'd'])
-		self.assertEquals(L, [(1, ('c', 'd')), (1, ('b', 'c')), (1, ('a', 'b'))])
+		self.assertEqual(L, [(1, ('c', 'd')), (1, ('b', 'c')), (1, ('a', 'b'))])
 
 	def test2(self):
 		L = createSortedSegmentList(['a', 'b', 'a', 'b'])
-		self.assertEquals(L, [(2, ('a', 'b')), (1, ('b', 'a'))])
+		self.assertEqual(L, [(2, ('a', 'b')), (1, ('b', 'a'))])
 
 	def test3(self):
 		L = createSortedSegmentList(['a', 'a', 'a', 'a', 'a'])
-		self.assertEquals(L, [(4, ('a', 'a'))])
+		self.assertEqual(L, [(4, ('a', 'a'))])
+
+	def test4(self):
+		w = ['a', 'b', 'a', 'b']
+		L = createSortedSegmentList(w, findSegmentPositions(w))
+		self.assertEqual(L, [(2, ('a', 'b')), (1, ('b', 'a'))])
+
+class Test__findSegmentPositions(unittest.TestCase):
+
+	def test1(self):
+		self.assertEqual(findSegmentPositions(['a']), {})
+		self.assertEqual(findSegmentPositions(['a', 'b', 'a', 'b']),
+			{('a', 'b'): [0, 2], ('b', 'a'): [1]})
+		self.assertEqual(findSegmentPositions(['a', 'a', 'a']),
+			{('a', 'a'): [0, 1]})
 
 class Test__hasRepeatingSymbol(unittest.TestCase):
 	
 	def test1(self):
-		self.assertEquals(hasRepeatingSymbol(['a', 'b', 'a', 'b']), None)
-		self.assertEquals(hasRepeatingSymbol(['a', 'b', 'c', 'd']), None)
-		self.assertEquals(hasRepeatingSymbol(['a', 'b', 'c', 'c']), (2, 3))
-		self.assertEquals(hasRepeatingSymbol(['a', 'a', 'a', 'a']), (0, 3))
+		self.assertEqual(hasRepeatingSymbol(['a', 'b', 'a', 'b']), None)
+		self.assertEqual(hasRepeatingSymbol(['a', 'b', 'c', 'd']), None)
+		self.assertEqual(hasRepeatingSymbol(['a', 'b', 'c', 'c']), (2, 3))
+		self.assertEqual(hasRepeatingSymbol(['a', 'a', 'a', 'a']), (0, 3))
 
 class Test__produceRepeatingSymbolGrammar(unittest.TestCase):
 
-        def test1(self):
-                P = {}
-                produceRepeatingSymbolGrammar(P, 'aaaaaaaa')    
-                self.assertEquals(len(P), 3)
-                self.assertEquals(P['aaaaaaaa'], ['aaaa', 'aaaa'])
-                self.assertEquals(P['aaaa'], ['aa', 'aa'])
-                self.assertEquals(P['aa'],['a', 'a'])
+	def test1(self):
+		P = {}
+		produceRepeatingSymbolGrammar(P, 'aaaaaaaa')    
+		self.assertEqual(len(P), 3)
+		self.assertEqual(P['aaaaaaaa'], ['aaaa', 'aaaa'])
+		self.assertEqual(P['aaaa'], ['aa', 'aa'])
+		self.assertEqual(P['aa'],['a', 'a'])
+
+	def test2(self):
+		P = {}
+		produceRepeatingSymbolGrammar(P, 'ababab')
+		self.assertEqual(P, {'ababab': ['aba', 'bab'], 'aba': ['ab', 'a'],
+			'ab': ['a', 'b'], 'bab': ['ba', 'b'], 'ba': ['b', 'a']})
 
 
 if __name__ == '__main__':
-        unittest.main()
+	unittest.main()
 
 
 